@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+人脸检测门控基准测试
+对比启用/禁用检测门控时的吞吐量 (FPS) 和 CPU 占用
+CPU 占用按固定摄像头帧率（默认 30 fps）节拍运行，统计 CPU 时间 / 实际经过时间，
+即无人值守时进程真正消耗的 CPU；另外给出每帧处理的 CPU 毫秒数
+
+用法:
+    python benchmark_face_gate.py --empty            # 空场景（无人脸的合成画面）
+    python benchmark_face_gate.py --video face.mp4   # 视频文件
+    python benchmark_face_gate.py --camera 0         # 摄像头
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import cv2
+
+import face_detector
+from yolo_tracker import YOLOFaceTracker
+
+
+class EmptyScene:
+    """合成的空场景：固定的低噪声灰色画面，模拟无人值守的展台"""
+
+    def __init__(self, width, height):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(90, 110, size=(height, width, 3), dtype=np.uint8)
+
+    def read(self, image=None):
+        if image is None or image.shape != self.frame.shape:
+            image = np.empty_like(self.frame)
+        np.copyto(image, self.frame)
+        return True, image
+
+    def release(self):
+        pass
+
+
+def open_source(args):
+    if args.empty:
+        return EmptyScene(args.width, args.height)
+    if args.video:
+        return cv2.VideoCapture(args.video)
+    cap = cv2.VideoCapture(args.camera)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, args.width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, args.height)
+    return cap
+
+
+def run_benchmark(args, detector):
+    """
+    吞吐量和 ms/帧、CPU ms/帧只统计 process_frame，不包括读帧和等待；
+    CPU% 统计整个按节拍运行的循环（包括读帧），除以实际经过时间
+    """
+    source = open_source(args)
+    tracker = YOLOFaceTracker(cap=source, detector=detector,
+                              detect_interval=args.detect_interval,
+                              roi_padding=args.roi_padding)
+
+    # 预热
+    for _ in range(args.warmup):
+        ret, frame = tracker.read_frame()
+        if not ret:
+            break
+        tracker.process_frame(frame)
+
+    frames = 0
+    detected = 0
+    wall = 0.0
+    cpu = 0.0
+    period = 1.0 / args.pace_fps if args.pace_fps > 0 else 0.0
+    loop_wall_start = time.perf_counter()
+    loop_cpu_start = time.process_time()
+    next_tick = loop_wall_start
+    for _ in range(args.frames):
+        ret, frame = tracker.read_frame()
+        if not ret:
+            break
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        result = tracker.process_frame(frame)
+        cpu += time.process_time() - cpu_start
+        wall += time.perf_counter() - wall_start
+
+        frames += 1
+        if result is not None:
+            detected += 1
+
+        # 按摄像头帧率节拍等待下一帧
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            # 处理跟不上帧率时不补帧
+            next_tick = time.perf_counter()
+    loop_wall = time.perf_counter() - loop_wall_start
+    loop_cpu = time.process_time() - loop_cpu_start
+
+    source.release()
+    tracker.face_landmarker.close()
+    tracker.sock.close()
+
+    return {
+        "frames": frames,
+        "detected": detected,
+        "fps": frames / wall if wall > 0 else 0,
+        "ms": wall / frames * 1000 if frames else 0,
+        "cpu_ms": cpu / frames * 1000 if frames else 0,
+        "cpu": loop_cpu / loop_wall * 100 if loop_wall > 0 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="人脸检测门控基准测试")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--empty", action="store_true", help="使用合成的空场景")
+    source.add_argument("--video", help="视频文件路径")
+    source.add_argument("--camera", type=int, default=0, help="摄像头 ID")
+    parser.add_argument("-W", "--width", type=int, default=1280, help="宽度")
+    parser.add_argument("-H", "--height", type=int, default=720, help="高度")
+    parser.add_argument("-n", "--frames", type=int, default=300, help="测试帧数")
+    parser.add_argument("--warmup", type=int, default=30, help="预热帧数")
+    parser.add_argument("--pace-fps", type=float, default=30,
+                        help="按此帧率节拍运行以统计 CPU 占用（0 表示不限速）")
+    parser.add_argument("--detector", default="yunet", choices=list(face_detector.DETECTORS),
+                        help="人脸检测器")
+    parser.add_argument("--detector-model", default=face_detector.DEFAULT_DETECTOR_MODEL,
+                        help="人脸检测器模型路径")
+    parser.add_argument("--detect-interval", type=int, default=5, help="检测间隔（帧）")
+    parser.add_argument("--roi-padding", type=float, default=0.5, help="人脸区域边距比例")
+    args = parser.parse_args()
+
+    detector = face_detector.load_detector(args.detector, args.detector_model)
+    if detector is None:
+        sys.exit(1)
+
+    results = {
+        "无门控": run_benchmark(args, None),
+        "检测门控": run_benchmark(args, detector),
+    }
+
+    print()
+    print(f"{'模式':<8} {'帧数':>6} {'检测到':>6} {'FPS':>8} {'ms/帧':>8} {'CPU ms/帧':>10} {'CPU%':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['frames']:>6} {r['detected']:>6} {r['fps']:>8.1f} {r['ms']:>8.2f} "
+              f"{r['cpu_ms']:>10.2f} {r['cpu']:>8.1f}")
+    if args.pace_fps > 0:
+        print(f"\nCPU% 为按 {args.pace_fps:g} fps 节拍运行时的进程 CPU 占用（100% = 一个核）")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,19 @@ OpenSeeFace WebSocket Bridge
 
 import asyncio
 import json
+import logging
+import os
 import struct
+import sys
 import websockets
 from collections import defaultdict
 
+# 共用的日志模块在项目根目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from log_setup import fields, setup_logging
+
+log = logging.getLogger("bridge")
+
 # 配置
 UDP_IP = "127.0.0.1"
 UDP_PORT = 11573
@@ -113,9 +122,7 @@ def parse_openseeface_packet(data):
             'features': features
         }
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Parse error: {e}")
+        log.exception("Parse error: %s", e, extra=fields(size=len(data)))
         return None
 
 async def udp_listener():
@@ -128,7 +135,7 @@ async def udp_listener():
         local_addr=(UDP_IP, UDP_PORT)
     )
     
-    print(f"UDP listener started on {UDP_IP}:{UDP_PORT}")
+    log.info("UDP listener started on %s:%d", UDP_IP, UDP_PORT)
     
     try:
         while True:
@@ -141,15 +148,15 @@ class UDPProtocol(asyncio.DatagramProtocol):
         # print(f"Received data: {len(data)} bytes") # Too noisy
         parsed = parse_openseeface_packet(data)
         if parsed:
-            print(f"Parsed: success={parsed['success']}")
+            log.debug("Parsed packet", extra=fields(success=parsed['success'], size=len(data)))
             if parsed['success']:
                 # 广播到所有 WebSocket 客户端
                 message = json.dumps(parsed)
                 asyncio.create_task(broadcast(message))
             else:
-                print("Tracking failed (success=0)")
+                log.info("Tracking failed (success=0)")
         else:
-            print(f"Failed to parse packet of size {len(data)}")
+            log.warning("Failed to parse packet", extra=fields(size=len(data)))
 
 async def broadcast(message):
     """向所有连接的客户端广播消息"""
@@ -162,7 +169,7 @@ async def broadcast(message):
 async def ws_handler(websocket, path=None):
     """处理 WebSocket 连接"""
     clients.add(websocket)
-    print(f"Client connected. Total clients: {len(clients)}")
+    log.info("Client connected", extra=fields(clients=len(clients)))
     
     try:
         async for message in websocket:
@@ -172,7 +179,7 @@ async def ws_handler(websocket, path=None):
         pass
     finally:
         clients.discard(websocket)
-        print(f"Client disconnected. Total clients: {len(clients)}")
+        log.info("Client disconnected", extra=fields(clients=len(clients)))
 
 async def main():
     print("=" * 50)
@@ -200,6 +207,16 @@ async def main():
     )
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OpenSeeFace WebSocket Bridge")
+    parser.add_argument("--log-file", default=None, help="日志文件（按大小轮转，JSON 格式）")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="日志级别")
+    args = parser.parse_args()
+
+    setup_logging("bridge", log_file=args.log_file, level=args.log_level)
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
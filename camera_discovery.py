@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+摄像头发现与能力缓存
+并行探测摄像头（每个设备独立超时），枚举支持的分辨率/帧率，
+结果按设备标识缓存到磁盘，启动时只重新验证选中的摄像头
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import cv2
+
+# 默认探测的索引范围 (0-9)
+MAX_CAMERA_INDEX = 10
+
+# 单个设备探测超时（秒）：到时间后不再尝试新的模式，返回已找到的模式
+PROBE_TIMEOUT = 8.0
+
+# 超时后等待正在进行的那一次模式切换完成的宽限时间（秒）
+PROBE_GRACE = 2.0
+
+# 候选模式 (宽, 高, 帧率)
+CANDIDATE_MODES = [
+    (1920, 1080, 60),
+    (1920, 1080, 30),
+    (1280, 720, 60),
+    (1280, 720, 30),
+    (640, 480, 60),
+    (640, 480, 30),
+]
+
+# 刚打开摄像头时读取帧的重试次数（macOS 前几帧经常读取失败）
+READ_RETRIES = 10
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".camera_cache.json")
+
+# 仍在运行的探测线程 {index: Thread}；超时的探测可能还占着设备
+_probing = {}
+_permission_checked = False
+
+
+def device_identity(index):
+    """
+    返回设备标识，用作缓存 key
+    Linux 下使用 sysfs 中的设备名和 USB 路径
+    macOS/Windows 下 OpenCV 拿不到设备名或唯一 ID，只能退化为平台 + 索引，
+    设备调换由启动验证时的模式检查兜底（见 _open_and_validate）
+    """
+    sysfs = f"/sys/class/video4linux/video{index}"
+    if os.path.isdir(sysfs):
+        try:
+            with open(os.path.join(sysfs, "name")) as f:
+                name = f.read().strip()
+        except OSError:
+            name = ""
+        device = os.path.realpath(os.path.join(sysfs, "device"))
+        return f"{sys.platform}:{name}:{device}"
+    return f"{sys.platform}:{index}"
+
+
+def _read_with_retry(cap):
+    """读取一帧，失败时稍作重试"""
+    for _ in range(READ_RETRIES):
+        ret, _ = cap.read()
+        if ret:
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def _ensure_permission(index):
+    """
+    macOS 下摄像头权限弹窗只能在主线程中触发，
+    并行探测前先在调用线程（主线程）打开一次摄像头
+    """
+    global _permission_checked
+    if sys.platform != "darwin" or _permission_checked:
+        return
+    _permission_checked = True
+    cap = cv2.VideoCapture(index)
+    cap.release()
+
+
+def probe_camera(index, modes=CANDIDATE_MODES, deadline=None, results=None):
+    """
+    探测单个摄像头，返回设备信息（包括实际支持的模式），打不开或读不到帧时返回 None
+
+    - deadline（time.monotonic() 时间）之后不再尝试新的模式，返回已找到的模式
+    - 读到第一帧后立即把设备信息放进 results[index]，之后找到的模式追加进去，
+      调用方在探测线程超时未结束时也能拿到已有的结果
+    """
+    cap = cv2.VideoCapture(index)
+    try:
+        if not cap.isOpened():
+            return None
+
+        if not _read_with_retry(cap):
+            return None
+
+        default_mode = [
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            round(cap.get(cv2.CAP_PROP_FPS), 1),
+        ]
+        supported = [default_mode]
+        info = {
+            "index": index,
+            "identity": device_identity(index),
+            "default_mode": default_mode,
+            "modes": supported,
+            "probed_at": time.time(),
+        }
+        if results is not None:
+            results[index] = info
+
+        # 逐个尝试候选模式，记录摄像头实际协商出的结果
+        for (width, height, fps) in modes:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            cap.set(cv2.CAP_PROP_FPS, fps)
+            if not _read_with_retry(cap):
+                continue
+            mode = [
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                round(cap.get(cv2.CAP_PROP_FPS), 1),
+            ]
+            if mode not in supported:
+                supported.append(mode)
+
+        return info
+    finally:
+        cap.release()
+
+
+def is_probing(index):
+    """该索引的探测线程是否仍在运行（仍占用设备）"""
+    t = _probing.get(index)
+    return t is not None and t.is_alive()
+
+
+def probe_cameras(indexes, timeout=PROBE_TIMEOUT, modes=CANDIDATE_MODES):
+    """
+    并行探测指定的摄像头
+    每个设备在独立的守护线程中探测，超时后只是不再枚举模式，已找到的模式照常返回；
+    只有打不开或读不到帧的设备才算不存在。上一次探测超时、仍占用设备的索引直接跳过
+    """
+    indexes = [index for index in indexes if not is_probing(index)]
+    if not indexes:
+        return []
+    _ensure_permission(indexes[0])
+
+    results = {}
+    deadline = time.monotonic() + timeout
+
+    def worker(index):
+        try:
+            probe_camera(index, modes, deadline, results)
+        except cv2.error:
+            pass
+
+    threads = []
+    for index in indexes:
+        t = threading.Thread(target=worker, args=(index,), daemon=True)
+        _probing[index] = t
+        t.start()
+        threads.append((index, t))
+
+    for _, t in threads:
+        t.join(max(0.0, deadline + PROBE_GRACE - time.monotonic()))
+
+    # 仍在运行的探测线程还在追加模式，返回当前结果的副本
+    return [dict(results[index], modes=list(results[index]["modes"]))
+            for index in indexes if index in results]
+
+
+def discover_cameras(max_index=MAX_CAMERA_INDEX, timeout=PROBE_TIMEOUT, modes=CANDIDATE_MODES):
+    """并行探测 0..max_index-1 号摄像头"""
+    return probe_cameras(range(max_index), timeout, modes)
+
+
+def load_cache(path=DEFAULT_CACHE_PATH):
+    """读取缓存，返回 {identity: info}；文件不存在或格式不对时返回空字典"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("cameras", {})
+
+
+def save_cache(cameras, path=DEFAULT_CACHE_PATH):
+    """
+    写入缓存，cameras 为 {identity: info}
+    写不进去（只读安装、磁盘满）时不使用缓存继续运行，返回 False
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "cameras": cameras}, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️  无法写入摄像头缓存 {path}: {e}")
+        return False
+    return True
+
+
+def choose_mode(info, width, height, fps=None):
+    """
+    从设备支持的模式中选出最接近目标分辨率的模式
+    分辨率相同时优先高帧率（指定 fps 时优先不超过 fps 的最高帧率）
+    """
+    target_area = width * height
+
+    def score(mode):
+        w, h, f = mode
+        over_fps = fps is not None and f > fps
+        return (abs(w * h - target_area), over_fps, -f)
+
+    return tuple(min(info["modes"], key=score))
+
+
+def _open_and_validate(index, mode):
+    """
+    打开摄像头并设置模式，能读到帧且协商出的分辨率与缓存一致才算有效；失败时返回 None
+    分辨率检查用来发现 macOS/Windows 下同一索引换了设备（这些平台的设备标识只有索引）
+    """
+    cap = cv2.VideoCapture(index)
+    if not cap.isOpened():
+        cap.release()
+        return None
+
+    width, height, fps = mode
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+
+    if not _read_with_retry(cap):
+        cap.release()
+        return None
+
+    actual = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    if actual != (width, height):
+        cap.release()
+        return None
+    return cap
+
+
+def open_camera(camera_id=None, width=1280, height=720, fps=None,
+                cache_path=DEFAULT_CACHE_PATH, rescan=False):
+    """
+    根据缓存选择摄像头和模式并打开，返回 (cap, camera_id, mode)
+
+    - camera_id 为 None 时选择缓存中索引最小的可用摄像头
+    - 只验证选中的摄像头；缓存缺失、设备标识变化或验证失败时才重新探测
+    - 返回的摄像头都已经读到过帧（包括 macOS 刚打开时的预热），调用方无需再预热
+    """
+    cameras = {} if rescan else load_cache(cache_path)
+
+    def candidates():
+        infos = sorted(cameras.values(), key=lambda info: info["index"])
+        if camera_id is not None:
+            infos = [info for info in infos if info["index"] == camera_id]
+        # 索引对应的设备变了（例如插拔后顺序变化），缓存不可信；
+        # 超时的探测线程仍占用的设备也跳过
+        return [info for info in infos
+                if info["identity"] == device_identity(info["index"]) and not is_probing(info["index"])]
+
+    for attempt in range(2):
+        for info in candidates():
+            mode = choose_mode(info, width, height, fps)
+            cap = _open_and_validate(info["index"], mode)
+            if cap is not None:
+                return cap, info["index"], mode
+            print(f"⚠️  摄像头 {info['index']} 验证失败，重新探测")
+            break
+
+        if attempt == 0:
+            # 缓存未命中：指定了摄像头时只探测它，否则并行探测全部
+            if camera_id is not None:
+                cameras = {k: v for k, v in cameras.items() if v["index"] != camera_id}
+                found = probe_cameras([camera_id])
+            else:
+                print("正在探测摄像头...")
+                found = discover_cameras()
+                cameras = {}
+            for info in found:
+                cameras[info["identity"]] = info
+            save_cache(cameras, cache_path)
+
+    # 兜底：没有可用的缓存信息时按请求参数直接打开
+    index = 0 if camera_id is None else camera_id
+    if is_probing(index):
+        print(f"⚠️  摄像头 {index} 的探测超时，设备可能仍被占用")
+    mode = (width, height, fps)
+    cap = cv2.VideoCapture(index)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    if cap.isOpened():
+        _read_with_retry(cap)
+    return cap, index, mode
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+下载 YuNet 人脸检测模型（用于追踪器的人脸检测门控）
+"""
+import urllib.request
+
+from face_detector import DEFAULT_DETECTOR_MODEL
+
+MODEL_URL = ("https://github.com/opencv/opencv_zoo/raw/main/models/"
+             "face_detection_yunet/face_detection_yunet_2023mar.onnx")
+
+print("正在下载 YuNet 人脸检测模型...")
+urllib.request.urlretrieve(MODEL_URL, DEFAULT_DETECTOR_MODEL)
+print(f"✅ 模型下载完成！保存到 {DEFAULT_DETECTOR_MODEL}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+轻量 CPU 人脸检测门控
+在 MediaPipe Face Landmarker 之前按间隔运行廉价的人脸检测器：
+没有人脸时跳过关键点提取，有人脸时只把带边距的人脸区域 (ROI) 交给 Landmarker
+"""
+
+import os
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+DEFAULT_DETECTOR_MODEL = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "face_detection_yunet_2023mar.onnx"
+)
+
+
+class FaceDetector(ABC):
+    """
+    检测器接口：detect(frame) 返回 [(x, y, w, h, score), ...]，坐标为原图像素
+    实现其他检测器（例如 onnxruntime 模型）时继承此类即可
+    """
+
+    @abstractmethod
+    def detect(self, frame):
+        pass
+
+
+class YuNetFaceDetector(FaceDetector):
+    """
+    OpenCV YuNet ONNX 人脸检测器（cv2.dnn 后端，纯 CPU）
+    先把画面缩小到 input_width 再检测，进一步降低开销
+    detector 可以传入已创建的 cv2.FaceDetectorYN（或同接口的对象），此时不加载 model_path
+    """
+
+    def __init__(self, model_path=DEFAULT_DETECTOR_MODEL, input_width=320,
+                 score_threshold=0.6, nms_threshold=0.3, top_k=10, detector=None):
+        self.input_width = input_width
+        if detector is None:
+            detector = cv2.FaceDetectorYN.create(
+                model_path, "", (input_width, input_width),
+                score_threshold, nms_threshold, top_k
+            )
+        self.detector = detector
+        self._input_size = None
+        self._small = None
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.input_width / width)
+        if scale < 1.0:
+            size = (int(width * scale), int(height * scale))
+            # 复用缩小后的缓冲区
+            if self._small is None or self._small.shape[:2] != (size[1], size[0]):
+                self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            small = cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+
+        input_size = (small.shape[1], small.shape[0])
+        if input_size != self._input_size:
+            self.detector.setInputSize(input_size)
+            self._input_size = input_size
+
+        _, faces = self.detector.detect(small)
+        if faces is None:
+            return []
+
+        return [
+            (f[0] / scale, f[1] / scale, f[2] / scale, f[3] / scale, float(f[14]))
+            for f in faces
+        ]
+
+
+# 可选检测器
+DETECTORS = {
+    "yunet": YuNetFaceDetector,
+}
+
+
+def create_detector(name="yunet", model_path=DEFAULT_DETECTOR_MODEL, **kwargs):
+    """按名称创建检测器"""
+    if name not in DETECTORS:
+        raise ValueError(f"未知的检测器: {name}（可选: {', '.join(DETECTORS)}）")
+    return DETECTORS[name](model_path, **kwargs)
+
+
+def load_detector(name="yunet", model_path=DEFAULT_DETECTOR_MODEL, **kwargs):
+    """创建检测器；模型文件不存在时提示下载并返回 None"""
+    if not os.path.exists(model_path):
+        print(f"⚠️  找不到人脸检测器模型 {model_path}")
+        print("    运行 python download_face_detector.py 下载模型")
+        return None
+    return create_detector(name, model_path, **kwargs)
+
+
+def padded_roi(box, frame_width, frame_height, padding=0.5):
+    """
+    把 (x, y, w, h) 扩展为带边距的正方形区域
+    靠近画面边缘时平移而不是截断，尽量保持正方形（缩放到固定大小时不变形）
+    返回 (x0, y0, x1, y1)
+    """
+    x, y, w, h = box
+    side = int(max(w, h) * (1 + padding))
+    side = min(side, frame_width, frame_height)
+    if side <= 0:
+        return None
+
+    x0 = int(x + w / 2 - side / 2)
+    y0 = int(y + h / 2 - side / 2)
+    x0 = min(max(0, x0), frame_width - side)
+    y0 = min(max(0, y0), frame_height - side)
+    return (x0, y0, x0 + side, y0 + side)
+
+
+class FaceGate:
+    """
+    检测门控
+    - 每 interval 帧运行一次检测器；没有人脸时 roi() 返回 None，调用方跳过 Landmarker
+    - 两次检测之间使用 Landmarker 的结果更新 ROI（跟踪）
+    - 正在跟踪时检测器漏检不关闭门控，只由 Landmarker 跟踪失败来关闭
+    - 跟踪丢失时下一帧立即重新检测
+    """
+
+    def __init__(self, detector, interval=5, padding=0.5):
+        self.detector = detector
+        self.interval = max(1, interval)
+        self.padding = padding
+
+        self._roi = None
+        self._tracking = False
+        self._frames_since_detect = self.interval
+        self._detected = False
+
+    def roi(self, frame):
+        """返回当前帧的人脸区域 (x0, y0, x1, y1)，没有人脸时返回 None"""
+        self._detected = False
+        if self._frames_since_detect >= self.interval:
+            self._frames_since_detect = 0
+            self._detected = True
+
+            height, width = frame.shape[:2]
+            faces = self.detector.detect(frame)
+            if faces:
+                best = max(faces, key=lambda f: f[4])
+                self._roi = padded_roi(best[:4], width, height, self.padding)
+            elif not self._tracking:
+                # 侧脸、遮挡时检测器容易漏检；正在跟踪就保留跟踪的 ROI
+                self._roi = None
+
+        self._frames_since_detect += 1
+        return self._roi
+
+    def update(self, box, frame_width, frame_height):
+        """
+        用 Landmarker 的结果更新 ROI
+        box 为关键点外接框 (x, y, w, h)；None 表示跟踪丢失
+        """
+        if box is None:
+            self._roi = None
+            self._tracking = False
+            # 刚检测过还没找到人脸就不必立刻重试，等下一个间隔
+            if not self._detected:
+                self._frames_since_detect = self.interval
+            return
+
+        self._roi = padded_roi(box, frame_width, frame_height, self.padding)
+        self._tracking = self._roi is not None
@@ -1,26 +1,22 @@
 #!/usr/bin/env python3
 """
-列出所有可用摄像头
+列出所有可用摄像头（并行探测，并刷新摄像头能力缓存）
 """
-import cv2
+import camera_discovery
 
 print("正在检测摄像头...\n")
 
-for i in range(10):  # 检查 0-9
-    cap = cv2.VideoCapture(i)
-    if cap.isOpened():
-        # 读取一帧来确认
-        ret, frame = cap.read()
-        if ret:
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            print(f"✅ 摄像头 {i}: {width}x{height}")
-        else:
-            print(f"⚠️  摄像头 {i}: 可以打开但无法读取帧")
-        cap.release()
-    else:
-        # 第一个失败后就停止检查
-        if i > 0:
-            break
+cameras = camera_discovery.discover_cameras()
+
+for info in cameras:
+    width, height, fps = info["default_mode"]
+    print(f"✅ 摄像头 {info['index']}: {width}x{height}")
+    for (w, h, f) in info["modes"]:
+        print(f"     {w}x{h} @ {f} fps")
+
+if not cameras:
+    print("❌ 没有找到可用的摄像头")
+
+camera_discovery.save_cache({info["identity"]: info for info in cameras})
 
 print("\n完成！")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+追踪器和 WebSocket 桥接共用的日志模块
+- 调用线程只把日志记录放进有界队列（满了直接丢弃），由后台线程负责写文件/终端，
+  采集循环和事件循环不会阻塞在日志 I/O 上
+- 按消息模板限流，超出的记录被丢弃，并在下一条同类记录上带上被抑制的条数；
+  之后没有同类记录时在清理过期窗口或退出时单独补报
+- 日志文件按大小轮转，每行一条 JSON，附带结构化字段，异常堆栈单独放在 exc 字段
+
+用法:
+    log = setup_logging("tracker", log_file="tracker.log")
+    log.info("FPS %.1f", fps, extra=fields(fps=fps, detected=True))
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# 队列长度上限，写入线程跟不上时丢弃新记录而不是阻塞调用方
+QUEUE_SIZE = 10000
+
+# 默认限流：每条消息模板每秒最多 5 条
+RATE_LIMIT = 5
+RATE_PERIOD = 1.0
+
+# 限流窗口多久没有新记录就清理（秒）；清理时补报被抑制的条数
+STALE_AFTER = 60.0
+
+# 日志文件轮转
+MAX_BYTES = 5 * 1024 * 1024
+BACKUP_COUNT = 3
+
+_listeners = []
+
+
+def fields(**kwargs):
+    """生成结构化字段，作为 extra 参数传给 logger"""
+    return {"fields": kwargs}
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按 (logger, 消息模板) 限流：每 period 秒最多放行 rate 条
+    被丢弃的条数会记在下一条放行记录的 suppressed 字段上；
+    之后再也没有同类记录时，由清理（超过 stale_after 秒的窗口）或 flush() 单独补报
+    """
+
+    def __init__(self, rate=RATE_LIMIT, period=RATE_PERIOD, handler=None, stale_after=STALE_AFTER):
+        super().__init__()
+        self.rate = rate
+        self.period = period
+        self.handler = handler
+        self.stale_after = stale_after
+        self._windows = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            if now - self._last_sweep >= self.stale_after:
+                stale = self._sweep(now)
+
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.period:
+                # [窗口开始时间, 已放行条数, 被抑制条数, 级别]
+                suppressed = window[2] if window is not None else 0
+                window = self._windows[key] = [now, 0, suppressed, record.levelno]
+
+            if window[1] >= self.rate:
+                window[2] += 1
+                allowed = False
+            else:
+                allowed = True
+                window[1] += 1
+                if window[2]:
+                    record.suppressed = window[2]
+                    window[2] = 0
+
+        self._report(stale)
+        return allowed
+
+    def flush(self):
+        """补报所有窗口中被抑制的条数（退出时调用）"""
+        with self._lock:
+            pending = self._sweep(None)
+        self._report(pending)
+
+    def _sweep(self, now):
+        """清理过期窗口（now 为 None 时清理全部），返回需要补报的 [(key, 级别, 条数)]"""
+        self._last_sweep = now if now is not None else time.monotonic()
+        pending = []
+        for key, window in list(self._windows.items()):
+            if now is None or now - window[0] >= self.stale_after:
+                if window[2]:
+                    pending.append((key, window[3], window[2]))
+                del self._windows[key]
+        return pending
+
+    def _report(self, pending):
+        if self.handler is None:
+            return
+        for (name, msg), levelno, count in pending:
+            record = logging.LogRecord(name, levelno, __file__, 0,
+                                       "已抑制 %d 条重复日志: %s", (count, msg), None)
+            record.suppressed = count
+            # 直接交给队列，不再经过限流
+            self.handler.emit(record)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时丢弃记录，丢弃条数记在下一条成功入队的记录上"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """
+        在调用线程中格式化消息参数，异常堆栈单独放在 exc_text 中
+        （默认实现会把堆栈拼进 msg，结构化日志里就无法单独过滤）
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+        record.exc_info = None
+        if record.stack_info:
+            record.exc_text = "\n".join(filter(None, [record.exc_text, record.stack_info]))
+        record.stack_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            record.dropped = self.dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped = 0
+
+
+_exception_formatter = logging.Formatter()
+
+
+def _extra_fields(record):
+    data = dict(getattr(record, "fields", None) or {})
+    for name in ("suppressed", "dropped"):
+        value = getattr(record, name, None)
+        if value:
+            data[name] = value
+    return data
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录一行 JSON：时间、级别、logger、消息和结构化字段"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """终端输出：时间 级别 logger: 消息 key=value ..."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s", "%H:%M:%S")
+
+    def formatMessage(self, record):
+        # 结构化字段跟在消息行末尾，异常堆栈（exc_text）由基类接在后面
+        line = super().formatMessage(record)
+        extra = _extra_fields(record)
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return line
+
+
+def setup_logging(name, log_file=None, level=logging.INFO, console=True,
+                  rate=RATE_LIMIT, period=RATE_PERIOD,
+                  max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+    """
+    配置名为 name 的 logger 并返回
+    指定 log_file 时写入按大小轮转的 JSON 日志文件，此时终端只输出 WARNING 及以上
+    """
+    handlers = []
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(ConsoleFormatter())
+        if log_file:
+            console_handler.setLevel(logging.WARNING)
+        handlers.append(console_handler)
+
+    log_queue = queue.Queue(QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    rate_filter = RateLimitFilter(rate, period, handler=queue_handler)
+    queue_handler.addFilter(rate_filter)
+
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append((listener, rate_filter))
+
+    return logger
+
+
+@atexit.register
+def shutdown_logging():
+    """补报被抑制的日志条数，停止后台写入线程，写完队列中剩余的记录"""
+    while _listeners:
+        listener, rate_filter = _listeners.pop()
+        rate_filter.flush()
+        listener.stop()
@@ -4,7 +4,7 @@
 trap "kill 0" EXIT
 
 echo "Starting OpenSeeFace Bridge..."
-/opt/miniconda3/bin/python3 -u bridge/ws_bridge.py > bridge.log 2>&1 &
+/opt/miniconda3/bin/python3 -u bridge/ws_bridge.py --log-file bridge.log > bridge.out 2>&1 &
 echo "Bridge started."
 
 # Wait a bit for bridge to be ready
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+摄像头发现与能力缓存测试（不需要真实摄像头）
+"""
+import contextlib
+import json
+import os
+import tempfile
+
+import camera_discovery
+
+CAMERA = {
+    "index": 0,
+    "identity": "cam-a",
+    "default_mode": [640, 480, 30.0],
+    "modes": [[640, 480, 30.0], [1280, 720, 30.0], [1280, 720, 60.0], [1920, 1080, 30.0]],
+    "probed_at": 0,
+}
+
+
+class FakeCapture:
+    """兜底路径打开的摄像头"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def isOpened(self):
+        return False
+
+    def set(self, prop, value):
+        pass
+
+
+@contextlib.contextmanager
+def patched(obj, **attrs):
+    """临时替换 obj 上的属性"""
+    saved = {name: getattr(obj, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(obj, name, value)
+
+
+@contextlib.contextmanager
+def fake_devices(identities, probe_results, validate):
+    """
+    替换设备相关的函数：identities 为 {index: identity}，probe_results 为探测返回的设备列表，
+    validate(index, mode) 决定验证结果。返回记录探测调用的列表
+    """
+    probe_calls = []
+
+    def probe_cameras(indexes, timeout=camera_discovery.PROBE_TIMEOUT, modes=camera_discovery.CANDIDATE_MODES):
+        indexes = list(indexes)
+        probe_calls.append(indexes)
+        return [dict(info) for info in probe_results if info["index"] in indexes]
+
+    with patched(camera_discovery,
+                 device_identity=lambda index: identities.get(index, f"none:{index}"),
+                 probe_cameras=probe_cameras,
+                 _open_and_validate=validate), \
+            patched(camera_discovery.cv2, VideoCapture=FakeCapture):
+        yield probe_calls
+
+
+def write_cache(path, cameras):
+    camera_discovery.save_cache({info["identity"]: info for info in cameras}, path)
+
+
+def test_choose_mode():
+    # 最接近的分辨率，同分辨率优先高帧率
+    assert camera_discovery.choose_mode(CAMERA, 1280, 720) == (1280, 720, 60.0)
+    assert camera_discovery.choose_mode(CAMERA, 1600, 900) == (1280, 720, 60.0)
+    assert camera_discovery.choose_mode(CAMERA, 1920, 1080) == (1920, 1080, 30.0)
+    # 指定 fps 时不超过 fps
+    assert camera_discovery.choose_mode(CAMERA, 1280, 720, fps=30) == (1280, 720, 30.0)
+
+
+def test_load_cache_fallbacks():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        assert camera_discovery.load_cache(path) == {}
+
+        with open(path, "w") as f:
+            f.write("{not json")
+        assert camera_discovery.load_cache(path) == {}
+
+        with open(path, "w") as f:
+            json.dump({"version": camera_discovery.CACHE_VERSION + 1, "cameras": {"x": CAMERA}}, f)
+        assert camera_discovery.load_cache(path) == {}
+
+        write_cache(path, [CAMERA])
+        assert camera_discovery.load_cache(path) == {"cam-a": CAMERA}
+
+
+def test_save_cache_unwritable():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "missing", "cache.json")
+        assert camera_discovery.save_cache({"cam-a": CAMERA}, path) is False
+
+
+def test_open_camera_identity_mismatch_reprobes():
+    swapped = dict(CAMERA, identity="cam-b")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        write_cache(path, [CAMERA])
+
+        with fake_devices({0: "cam-b"}, [swapped], lambda index, mode: ("cap", index)) as probe_calls:
+            cap, index, mode = camera_discovery.open_camera(cache_path=path)
+
+        assert probe_calls == [list(range(camera_discovery.MAX_CAMERA_INDEX))]
+        assert (cap, index, mode) == (("cap", 0), 0, (1280, 720, 60.0))
+        assert list(camera_discovery.load_cache(path)) == ["cam-b"]
+
+
+def test_open_camera_cache_hit_does_not_probe():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        write_cache(path, [CAMERA])
+
+        with fake_devices({0: "cam-a"}, [], lambda index, mode: ("cap", index)) as probe_calls:
+            cap, index, _ = camera_discovery.open_camera(cache_path=path)
+
+        assert probe_calls == []
+        assert (cap, index) == (("cap", 0), 0)
+
+
+def test_open_camera_id_probes_only_that_device():
+    other = dict(CAMERA, index=2, identity="cam-c")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        write_cache(path, [CAMERA])
+
+        with fake_devices({0: "cam-a", 2: "cam-c"}, [CAMERA, other],
+                          lambda index, mode: ("cap", index)) as probe_calls:
+            cap, index, _ = camera_discovery.open_camera(camera_id=2, cache_path=path)
+
+        assert probe_calls == [[2]]
+        assert (cap, index) == (("cap", 2), 2)
+        # 其他摄像头的缓存保留
+        assert sorted(camera_discovery.load_cache(path)) == ["cam-a", "cam-c"]
+
+
+def test_open_camera_failed_validation_reprobes_once_then_falls_back():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        write_cache(path, [CAMERA])
+
+        with fake_devices({0: "cam-a"}, [CAMERA], lambda index, mode: None) as probe_calls:
+            cap, index, mode = camera_discovery.open_camera(width=640, height=480, cache_path=path)
+
+        assert len(probe_calls) == 1
+        assert isinstance(cap, FakeCapture)
+        assert (index, mode) == (0, (640, 480, None))
+
+
+if __name__ == "__main__":
+    test_choose_mode()
+    test_load_cache_fallbacks()
+    test_save_cache_unwritable()
+    test_open_camera_identity_mismatch_reprobes()
+    test_open_camera_cache_hit_does_not_probe()
+    test_open_camera_id_probes_only_that_device()
+    test_open_camera_failed_validation_reprobes_once_then_falls_back()
+    print("✅ 摄像头发现测试通过")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+人脸检测门控测试
+"""
+import numpy as np
+
+from face_detector import FaceDetector, FaceGate
+
+WIDTH = 1280
+HEIGHT = 720
+FACE = (500, 200, 200, 200, 0.9)
+
+
+class ScriptedDetector(FaceDetector):
+    """按顺序返回预设的检测结果，用完后一直返回最后一个"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = 0
+
+    def detect(self, frame):
+        result = self.results[min(self.calls, len(self.results) - 1)]
+        self.calls += 1
+        return result
+
+
+def test_detector_miss_keeps_tracked_roi():
+    # 第一次检测到人脸，之后检测器一直漏检，而 Landmarker 每帧都跟踪成功
+    gate = FaceGate(ScriptedDetector([[FACE], []]), interval=5)
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    for i in range(12):
+        roi = gate.roi(frame)
+        assert roi is not None, f"帧 {i} 门控被检测器漏检关闭"
+        gate.update(FACE[:4], WIDTH, HEIGHT)
+
+    assert gate.detector.calls == 3
+
+
+def test_detector_miss_closes_gate_when_not_tracking():
+    gate = FaceGate(ScriptedDetector([[FACE], []]), interval=5)
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    # 检测到人脸后跟踪两帧
+    for _ in range(3):
+        assert gate.roi(frame) is not None
+        gate.update(FACE[:4], WIDTH, HEIGHT)
+
+    # Landmarker 跟踪失败，下一帧立即重新检测；检测器漏检，门控关闭
+    assert gate.roi(frame) is not None
+    gate.update(None, WIDTH, HEIGHT)
+    assert gate.roi(frame) is None
+    assert gate.detector.calls == 2
+
+    # 没有在跟踪，间隔内不再运行检测器
+    for _ in range(4):
+        assert gate.roi(frame) is None
+    assert gate.detector.calls == 2
+
+
+if __name__ == "__main__":
+    test_detector_miss_keeps_tracked_roi()
+    test_detector_miss_closes_gate_when_not_tracking()
+    print("✅ 检测门控测试通过")
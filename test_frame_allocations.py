@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+帧处理热路径内存分配回归测试
+用 tracemalloc 统计稳态下每帧的分配：读帧 → （检测门控 → ROI 缩放）→ 颜色转换 → 68 点 → 姿态 → UDP 数据包
+每帧临时分配应只有几 KB（Python 小对象），且没有持续增长
+
+注意：tracemalloc 只能看到 Python 和 numpy 的分配，看不到原生代码的分配。
+mp.Image 每帧在 C++ 中复制一份 RGB 像素（MediaPipe 没有复用 Image 的接口），这部分不在本测试的统计范围内
+Landmarker 用固定结果代替（不加载 face_landmarker.task），但 process_frame 仍会创建 mp.Image，需要安装 mediapipe
+"""
+import socket
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmark_face_gate import EmptyScene
+from face_detector import YuNetFaceDetector
+from yolo_tracker import YOLOFaceTracker
+
+WIDTH = 1280
+HEIGHT = 720
+WARMUP_FRAMES = 30
+TEST_FRAMES = 300
+
+# 每帧临时分配上限（实测约 1.2 KB；一帧 720p BGR 图像约 2.7 MB）
+MAX_TRANSIENT_PER_FRAME = 4 * 1024
+# 稳态每帧净增长上限
+MAX_GROWTH_PER_FRAME = 256
+
+
+class FixedLandmarker:
+    """固定返回同一组关键点的 Landmarker，保证每帧都走完整的关键点和发包路径"""
+
+    def __init__(self):
+        landmarks = [SimpleNamespace(x=0.4 + (i % 20) * 0.01, y=0.3 + (i // 20) * 0.01)
+                     for i in range(478)]
+        self.result = SimpleNamespace(face_landmarks=[landmarks])
+
+    def detect(self, image):
+        return self.result
+
+    def close(self):
+        pass
+
+
+class FixedYuNetModel:
+    """代替 cv2.FaceDetectorYN 的固定结果模型，不需要下载 ONNX 模型文件"""
+
+    def __init__(self):
+        # 缩小后画面中的一张人脸：x, y, w, h, 10 个关键点坐标, score
+        self.faces = np.zeros((1, 15), dtype=np.float32)
+        self.faces[0, :4] = (100, 40, 60, 70)
+        self.faces[0, 14] = 0.9
+
+    def setInputSize(self, size):
+        pass
+
+    def detect(self, image):
+        return 1, self.faces
+
+
+def step(tracker):
+    ret, frame = tracker.read_frame()
+    assert ret
+    result = tracker.process_frame(frame)
+    assert result is not None
+    landmarks_68, euler = result
+    tracker.send_tracking_data(landmarks_68, euler, frame.shape[1], frame.shape[0])
+
+
+def measure(detector=None):
+    """返回 (每帧最大临时分配, 每帧净增长)，单位字节"""
+    # 发往一个本地丢弃端口
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    port = sink.getsockname()[1]
+
+    tracker = YOLOFaceTracker(cap=EmptyScene(WIDTH, HEIGHT), target_port=port,
+                              detector=detector, detect_interval=3,
+                              face_landmarker=FixedLandmarker())
+
+    try:
+        for _ in range(WARMUP_FRAMES):
+            step(tracker)
+
+        tracemalloc.start()
+        try:
+            start, _ = tracemalloc.get_traced_memory()
+            max_transient = 0
+            for _ in range(TEST_FRAMES):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                step(tracker)
+                _, peak = tracemalloc.get_traced_memory()
+                max_transient = max(max_transient, peak - before)
+            end, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        tracker.sock.close()
+        sink.close()
+
+    return max_transient, (end - start) / TEST_FRAMES
+
+
+def check(name, max_transient, growth_per_frame):
+    print(f"{name}: 每帧最大临时分配 {max_transient} bytes, 每帧净增长 {growth_per_frame:.1f} bytes")
+    assert max_transient < MAX_TRANSIENT_PER_FRAME, max_transient
+    assert growth_per_frame < MAX_GROWTH_PER_FRAME, growth_per_frame
+
+
+def test_steady_state_allocation():
+    check("全图", *measure())
+
+
+def test_steady_state_allocation_gated():
+    # 检测门控 + ROI 裁剪缩放路径
+    # YuNetFaceDetector.detect 的缩放路径照常执行，只替换 ONNX 模型
+    check("检测门控", *measure(YuNetFaceDetector(detector=FixedYuNetModel())))
+
+
+if __name__ == "__main__":
+    test_steady_state_allocation()
+    test_steady_state_allocation_gated()
+    print("✅ 稳态分配检查通过")
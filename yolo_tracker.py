@@ -5,103 +5,160 @@ YOLO + MediaPipe 人脸追踪器
 """
 
 import cv2
+import logging
 import numpy as np
 import socket
 import struct
 import time
 import mediapipe as mp
 
+import camera_discovery
+import face_detector
+from log_setup import fields, setup_logging
+
+log = logging.getLogger("tracker")
+
+# MediaPipe 到 iBUG 68 点的映射（与 cameraTracker.js 中一致）
+MEDIAPIPE_TO_68 = {
+    # 面部轮廓 (0-16)
+    0: 10, 1: 338, 2: 297, 3: 332, 4: 284,
+    5: 251, 6: 389, 7: 356, 8: 454, 9: 323,
+    10: 361, 11: 288, 12: 397, 13: 365, 14: 379,
+    15: 378, 16: 400,
+    # 左眉毛 (17-21)
+    17: 70, 18: 63, 19: 105, 20: 66, 21: 107,
+    # 右眉毛 (22-26)
+    22: 336, 23: 296, 24: 334, 25: 293, 26: 300,
+    # 鼻梁 (27-30)
+    27: 168, 28: 6, 29: 197, 30: 195,
+    # 鼻底 (31-35)
+    31: 98, 32: 97, 33: 2, 34: 326, 35: 327,
+    # 左眼 (36-41)
+    36: 33, 37: 160, 38: 158, 39: 133, 40: 153, 41: 144,
+    # 右眼 (42-47)
+    42: 362, 43: 385, 44: 387, 45: 263, 46: 373, 47: 380,
+    # 外嘴唇 (48-59)
+    48: 61, 49: 39, 50: 37, 51: 0, 52: 267, 53: 269,
+    54: 291, 55: 405, 56: 314, 57: 17, 58: 84, 59: 181,
+    # 内嘴唇 (60-67)
+    60: 78, 61: 82, 62: 13, 63: 312, 64: 308,
+    65: 317, 66: 14, 67: 87
+}
+
+# 计算跟踪 ROI 用的 MediaPipe 关键点：左右脸颊边缘、额头顶部、下巴，左右对称覆盖整张脸
+# （68 点中的"轮廓"0-16 只覆盖半边脸，不能用来算外接框）
+FACE_BOX_LANDMARKS = (234, 454, 10, 152)
+
+# 帧缓冲池大小：采集帧和 RGB 帧各自在固定数量的缓冲区之间轮换复用
+FRAME_POOL_SIZE = 2
+
+# ROI 裁剪图统一缩放到的边长，裁剪缓冲区因此可以复用
+ROI_SIZE = 256
+
+# UDP 数据包（兼容 OpenSeeFace 格式，字段紧密排列）：
+# 时间戳、Face ID、分辨率、眨眼、Success、PnP error、四元数、欧拉角、平移，
+# 之后是 68 个 confidence 和 68 对 (y, x) 坐标
+PACKET_HEADER = struct.Struct("=diffffBf4f3f3f")
+PACKET_SIZE = PACKET_HEADER.size + 68 * 3 * 4
+
+
+def pooled_buffer(pool, index, shape):
+    """取缓冲池中第 index 个缓冲区，形状不符（首次使用或分辨率变化）时才重新分配"""
+    buf = pool[index]
+    if buf is None or buf.shape != shape:
+        buf = pool[index] = np.empty(shape, dtype=np.uint8)
+    return buf
+
+
+def create_face_landmarker(model_path='face_landmarker.task'):
+    """创建 MediaPipe Face Landmarker (新 API)"""
+    print("初始化 MediaPipe Face Landmarker...")
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+
+    base_options = python.BaseOptions(model_asset_path=model_path)
+    options = vision.FaceLandmarkerOptions(
+        base_options=base_options,
+        num_faces=1,
+        min_face_detection_confidence=0.5,
+        min_face_presence_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+    return vision.FaceLandmarker.create_from_options(options)
+
 class YOLOFaceTracker:
-    def __init__(self, camera_id=0, width=1280, height=720, target_ip="127.0.0.1", target_port=11573):
-        self.camera_id = camera_id
+    def __init__(self, camera_id=None, width=1280, height=720, target_ip="127.0.0.1", target_port=11573,
+                 fps=None, rescan_cameras=False, cap=None, detector=None, detect_interval=5,
+                 roi_padding=0.5, face_landmarker=None):
         self.width = width
         self.height = height
         self.target_ip = target_ip
         self.target_port = target_port
 
-        # 初始化摄像头
-        print("正在打开摄像头...")
-        self.cap = cv2.VideoCapture(camera_id)
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-
-        # macOS 摄像头初始化修复
-        import sys
-        if sys.platform == 'darwin':
-            print("等待 macOS 摄像头初始化...")
-            time.sleep(2)
-            for i in range(10):
-                self.cap.read()
-                time.sleep(0.1)
-            print("✅ 摄像头初始化完成")
-
-        # 不使用 YOLO，直接用 MediaPipe 检测
-        # MediaPipe 已经包含了人脸检测功能
-        print("✅ 使用 MediaPipe 进行人脸检测和关键点提取")
-        self.yolo = None
-
-        # 初始化 MediaPipe Face Mesh (新 API)
-        print("初始化 MediaPipe Face Landmarker...")
-        from mediapipe.tasks import python
-        from mediapipe.tasks.python import vision
-
-        # 创建 Face Landmarker
-        base_options = python.BaseOptions(model_asset_path='face_landmarker.task')
-        options = vision.FaceLandmarkerOptions(
-            base_options=base_options,
-            num_faces=1,
-            min_face_detection_confidence=0.5,
-            min_face_presence_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.face_landmarker = vision.FaceLandmarker.create_from_options(options)
+        if cap is not None:
+            # 外部传入的视频源（视频文件、基准测试等）
+            self.cap = cap
+            self.camera_id = camera_id
+        else:
+            # 初始化摄像头（从能力缓存中选择摄像头和模式，只验证选中的摄像头）
+            print("正在打开摄像头...")
+            self.cap, self.camera_id, mode = camera_discovery.open_camera(
+                camera_id, width, height, fps, rescan=rescan_cameras
+            )
+            print(f"✅ 摄像头 {self.camera_id}: {mode[0]}x{mode[1]} @ {mode[2] or '默认'} fps")
+
+        # 人脸检测门控：按间隔运行轻量检测器，没有人脸时跳过 Landmarker，
+        # 有人脸时只处理带边距的人脸区域。detector 为 None 时每帧全图交给 MediaPipe
+        if detector is not None:
+            print(f"✅ 启用人脸检测门控（每 {detect_interval} 帧检测一次）")
+            self.face_gate = face_detector.FaceGate(detector, detect_interval, roi_padding)
+        else:
+            print("✅ 使用 MediaPipe 进行人脸检测和关键点提取")
+            self.face_gate = None
+
+        # 初始化 MediaPipe Face Mesh (新 API)；也可以传入已创建的 Landmarker（测试等）
+        if face_landmarker is None:
+            face_landmarker = create_face_landmarker()
+        self.face_landmarker = face_landmarker
 
         # UDP socket
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.target_addr = (target_ip, target_port)
+
+        # 热路径复用的缓冲区：循环中不再为每帧分配帧、关键点和数据包
+        self._frames = [None] * FRAME_POOL_SIZE
+        self._frame_index = 0
+        self._rgb_frames = [None] * FRAME_POOL_SIZE
+        self._rgb_index = 0
+        self._roi_bgr = np.empty((ROI_SIZE, ROI_SIZE, 3), dtype=np.uint8)
+        self._landmarks_68 = np.zeros((68, 3), dtype=np.float64)
+        self._packet = bytearray(PACKET_SIZE)
+        # 数据包中 68 个 confidence 和 68 对 (y, x) 坐标的视图，直接写入
+        packet_points = np.frombuffer(self._packet, dtype=np.float32,
+                                      count=68 * 3, offset=PACKET_HEADER.size)
+        self._packet_confidence = packet_points[:68]
+        self._packet_coords = packet_points[68:].reshape(68, 2)
 
         print(f"✅ 初始化完成！发送数据到 {target_ip}:{target_port}")
 
-    def mediapipe_to_68_points(self, landmarks, frame_width, frame_height):
+    def mediapipe_to_68_points(self, landmarks, frame_width, frame_height, offset_x=0, offset_y=0):
         """
         将 MediaPipe 的 478 点转换为 iBUG 标准的 68 点
+        landmarks 在 ROI 裁剪图上检测时，frame_width/height 为裁剪图大小，offset 为裁剪图在原图中的位置
+        返回 68x3 的 (x, y, confidence) 数组；该数组是复用的缓冲区，下一帧会被覆盖
         """
-        # MediaPipe 到 iBUG 68 点的映射（与 cameraTracker.js 中一致）
-        mapping = {
-            # 面部轮廓 (0-16)
-            0: 10, 1: 338, 2: 297, 3: 332, 4: 284,
-            5: 251, 6: 389, 7: 356, 8: 454, 9: 323,
-            10: 361, 11: 288, 12: 397, 13: 365, 14: 379,
-            15: 378, 16: 400,
-            # 左眉毛 (17-21)
-            17: 70, 18: 63, 19: 105, 20: 66, 21: 107,
-            # 右眉毛 (22-26)
-            22: 336, 23: 296, 24: 334, 25: 293, 26: 300,
-            # 鼻梁 (27-30)
-            27: 168, 28: 6, 29: 197, 30: 195,
-            # 鼻底 (31-35)
-            31: 98, 32: 97, 33: 2, 34: 326, 35: 327,
-            # 左眼 (36-41)
-            36: 33, 37: 160, 38: 158, 39: 133, 40: 153, 41: 144,
-            # 右眼 (42-47)
-            42: 362, 43: 385, 44: 387, 45: 263, 46: 373, 47: 380,
-            # 外嘴唇 (48-59)
-            48: 61, 49: 39, 50: 37, 51: 0, 52: 267, 53: 269,
-            54: 291, 55: 405, 56: 314, 57: 17, 58: 84, 59: 181,
-            # 内嘴唇 (60-67)
-            60: 78, 61: 82, 62: 13, 63: 312, 64: 308,
-            65: 317, 66: 14, 67: 87
-        }
-
-        points_68 = []
+        points_68 = self._landmarks_68
+        num_landmarks = len(landmarks)
         for i in range(68):
-            mp_idx = mapping[i]
-            if mp_idx < len(landmarks):
+            mp_idx = MEDIAPIPE_TO_68[i]
+            point = points_68[i]
+            if mp_idx < num_landmarks:
                 lm = landmarks[mp_idx]
-                x = lm.x * frame_width
-                y = lm.y * frame_height
-                points_68.append((x, y, 1.0))  # (x, y, confidence)
+                point[0] = lm.x * frame_width + offset_x
+                point[1] = lm.y * frame_height + offset_y
+                point[2] = 1.0
             else:
-                points_68.append((0, 0, 0))
+                point[:] = 0.0
 
         return points_68
 
@@ -163,54 +220,102 @@ class YOLOFaceTracker:
         """
         发送追踪数据到 UDP socket（兼容 OpenSeeFace 格式）
         """
-        packet = bytearray()
-
-        # 时间戳 (double, 8 bytes)
-        packet.extend(struct.pack("d", time.time()))
-
-        # Face ID (int, 4 bytes)
-        packet.extend(struct.pack("i", 0))
-
-        # 分辨率 (float * 2, 8 bytes)
-        packet.extend(struct.pack("f", float(frame_width)))
-        packet.extend(struct.pack("f", float(frame_height)))
-
-        # 眼睛眨眼数据 (float * 2, 8 bytes) - 暂时用固定值
-        packet.extend(struct.pack("f", 1.0))  # left eye open
-        packet.extend(struct.pack("f", 1.0))  # right eye open
-
-        # Success (byte, 1 byte)
-        packet.extend(struct.pack("B", 1))
+        # 头部字段：时间戳、Face ID、分辨率、眨眼（暂时用固定值）、Success、PnP error、
+        # 四元数、欧拉角、平移（暂时用固定值）
+        quat = self.quaternion_from_euler(*euler)
+        PACKET_HEADER.pack_into(
+            self._packet, 0,
+            time.time(), 0,
+            float(frame_width), float(frame_height),
+            1.0, 1.0,
+            1,
+            0.1,
+            quat[0], quat[1], quat[2], quat[3],
+            euler[0], euler[1], euler[2],
+            0.0, 0.0, 0.0
+        )
 
-        # PnP error (float, 4 bytes)
-        packet.extend(struct.pack("f", 0.1))
+        # 68 个关键点：先 confidence，再 (y, x)，直接写入数据包缓冲区
+        self._packet_confidence[:] = landmarks_68[:, 2]
+        self._packet_coords[:, 0] = landmarks_68[:, 1]
+        self._packet_coords[:, 1] = landmarks_68[:, 0]
 
-        # Quaternion (4 floats, 16 bytes)
-        quat = self.quaternion_from_euler(*euler)
-        for q in quat:
-            packet.extend(struct.pack("f", q))
+        # 发送数据包
+        self.sock.sendto(self._packet, self.target_addr)
 
-        # Euler angles (3 floats, 12 bytes)
-        for angle in euler:
-            packet.extend(struct.pack("f", angle))
+    def process_frame(self, frame):
+        """
+        处理一帧：检测门控 → MediaPipe 关键点 → 68 点 → 头部姿态
+        返回 (landmarks_68, euler)，没有检测到人脸时返回 None
+        """
+        frame_height, frame_width = frame.shape[:2]
+
+        roi = None
+        if self.face_gate is not None:
+            roi = self.face_gate.roi(frame)
+            if roi is None:
+                # 画面中没有人脸，跳过 Landmarker
+                return None
+
+        # MediaPipe 人脸检测和关键点提取 (新 API)
+        # 颜色转换写入缓冲池中的 RGB 缓冲区，不为每帧分配新数组
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            src_width, src_height = x1 - x0, y1 - y0
+            # ROI 统一缩放到 ROI_SIZE，关键点是归一化坐标，映射回原图时用 ROI 的实际大小
+            cv2.resize(frame[y0:y1, x0:x1], (ROI_SIZE, ROI_SIZE), dst=self._roi_bgr,
+                       interpolation=cv2.INTER_LINEAR)
+            src = self._roi_bgr
+        else:
+            x0, y0 = 0, 0
+            src_width, src_height = frame_width, frame_height
+            src = frame
+        frame_rgb = pooled_buffer(self._rgb_frames, self._rgb_index, src.shape)
+        self._rgb_index = (self._rgb_index + 1) % FRAME_POOL_SIZE
+        cv2.cvtColor(src, cv2.COLOR_BGR2RGB, dst=frame_rgb)
+        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+
+        detection_result = self.face_landmarker.detect(mp_image)
+
+        if not detection_result.face_landmarks:
+            if self.face_gate is not None:
+                self.face_gate.update(None, frame_width, frame_height)
+            return None
+
+        face_landmarks = detection_result.face_landmarks[0]
+
+        # 转换为 68 点（原图坐标）
+        landmarks_68 = self.mediapipe_to_68_points(
+            face_landmarks, src_width, src_height, x0, y0
+        )
 
-        # Translation (3 floats, 12 bytes) - 暂时用固定值
-        packet.extend(struct.pack("f", 0.0))
-        packet.extend(struct.pack("f", 0.0))
-        packet.extend(struct.pack("f", 0.0))
+        if self.face_gate is not None:
+            # 外接框用 MediaPipe 原始关键点计算（归一化坐标 → 原图坐标）
+            xs = [face_landmarks[i].x for i in FACE_BOX_LANDMARKS]
+            ys = [face_landmarks[i].y for i in FACE_BOX_LANDMARKS]
+            x_min, x_max = min(xs), max(xs)
+            y_min, y_max = min(ys), max(ys)
+            box = (x_min * src_width + x0, y_min * src_height + y0,
+                   (x_max - x_min) * src_width, (y_max - y_min) * src_height)
+            self.face_gate.update(box, frame_width, frame_height)
 
-        # 68 个关键点：先 confidence，再 (y, x)
-        # 先发送 68 个 confidence
-        for (x, y, c) in landmarks_68:
-            packet.extend(struct.pack("f", c))
+        # 估算头部姿态
+        euler = self.estimate_head_pose(landmarks_68)
 
-        # 再发送 68 对 (y, x) 坐标
-        for (x, y, c) in landmarks_68:
-            packet.extend(struct.pack("f", y))
-            packet.extend(struct.pack("f", x))
+        return landmarks_68, euler
 
-        # 发送数据包
-        self.sock.sendto(packet, (self.target_ip, self.target_port))
+    def read_frame(self):
+        """
+        读取一帧到缓冲池中的采集缓冲区（cap.read 原地写入）
+        返回的帧在 FRAME_POOL_SIZE 帧之后会被覆盖
+        """
+        index = self._frame_index
+        ret, frame = self.cap.read(self._frames[index])
+        if ret:
+            # 首帧或分辨率变化时 OpenCV 会分配新数组，之后一直复用它
+            self._frames[index] = frame
+            self._frame_index = (index + 1) % FRAME_POOL_SIZE
+        return ret, frame
 
     def run(self, visualize=True):
         """
@@ -223,40 +328,28 @@ class YOLOFaceTracker:
 
         try:
             while True:
-                ret, frame = self.cap.read()
+                ret, frame = self.read_frame()
                 if not ret:
-                    print("❌ 无法读取帧")
+                    log.error("无法读取帧")
                     break
 
                 frame_count += 1
 
-                # MediaPipe 人脸检测和关键点提取 (新 API)
-                import mediapipe as mp
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
-
-                detection_result = self.face_landmarker.detect(mp_image)
+                result = self.process_frame(frame)
 
                 detected = False
 
-                if detection_result.face_landmarks:
-                    face_landmarks = detection_result.face_landmarks[0]
-
-                    # 转换为 68 点
-                    landmarks_68 = self.mediapipe_to_68_points(
-                        face_landmarks, frame.shape[1], frame.shape[0]
-                    )
-
-                    # DEBUG: 打印前几个关键点
-                    if frame_count % 30 == 0:
-                        print(f"\nDEBUG 关键点示例:")
-                        print(f"  鼻尖(30): x={landmarks_68[30][0]:.1f}, y={landmarks_68[30][1]:.1f}")
-                        print(f"  左眼(36): x={landmarks_68[36][0]:.1f}, y={landmarks_68[36][1]:.1f}")
-                        print(f"  右眼(45): x={landmarks_68[45][0]:.1f}, y={landmarks_68[45][1]:.1f}")
-                        print(f"  帧大小: {frame.shape[1]}x{frame.shape[0]}")
+                if result is not None:
+                    landmarks_68, euler = result
 
-                    # 估算头部姿态
-                    euler = self.estimate_head_pose(landmarks_68)
+                    # DEBUG: 记录前几个关键点（写日志由后台线程完成）
+                    if frame_count % 30 == 0 and log.isEnabledFor(logging.DEBUG):
+                        log.debug("关键点示例", extra=fields(
+                            nose=(round(landmarks_68[30][0], 1), round(landmarks_68[30][1], 1)),
+                            left_eye=(round(landmarks_68[36][0], 1), round(landmarks_68[36][1], 1)),
+                            right_eye=(round(landmarks_68[45][0], 1), round(landmarks_68[45][1], 1)),
+                            frame=f"{frame.shape[1]}x{frame.shape[0]}",
+                        ))
 
                     # 发送追踪数据
                     self.send_tracking_data(landmarks_68, euler, frame.shape[1], frame.shape[0])
@@ -280,7 +373,8 @@ class YOLOFaceTracker:
                 if frame_count % 30 == 0:
                     elapsed = time.time() - fps_start
                     fps = 30 / elapsed if elapsed > 0 else 0
-                    print(f"FPS: {fps:.1f} | 检测: {'✅' if detected else '❌'}")
+                    log.info("FPS: %.1f | 检测: %s", fps, "✅" if detected else "❌",
+                             extra=fields(fps=round(fps, 1), detected=detected))
                     fps_start = time.time()
 
                 # 显示画面
@@ -302,21 +396,46 @@ if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="YOLO + MediaPipe 人脸追踪器")
-    parser.add_argument("-c", "--camera", type=int, default=0, help="摄像头 ID")
+    parser.add_argument("-c", "--camera", type=int, default=None, help="摄像头 ID（默认从缓存中自动选择）")
     parser.add_argument("-W", "--width", type=int, default=1280, help="宽度")
     parser.add_argument("-H", "--height", type=int, default=720, help="高度")
+    parser.add_argument("-F", "--fps", type=float, default=None, help="帧率")
+    parser.add_argument("--rescan-cameras", action="store_true", help="忽略缓存，重新探测摄像头")
     parser.add_argument("-i", "--ip", default="127.0.0.1", help="目标 IP")
     parser.add_argument("-p", "--port", type=int, default=11573, help="目标端口")
     parser.add_argument("--no-visualize", action="store_true", help="禁用可视化")
+    parser.add_argument("--detector", default="yunet", choices=list(face_detector.DETECTORS),
+                        help="人脸检测门控使用的检测器")
+    parser.add_argument("--detector-model", default=face_detector.DEFAULT_DETECTOR_MODEL,
+                        help="人脸检测器模型路径")
+    parser.add_argument("--detect-interval", type=int, default=5,
+                        help="每隔多少帧运行一次人脸检测（0 表示禁用检测门控）")
+    parser.add_argument("--roi-padding", type=float, default=0.5, help="人脸区域边距比例")
+    parser.add_argument("--log-file", default=None, help="日志文件（按大小轮转，JSON 格式）")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="日志级别")
 
     args = parser.parse_args()
 
+    setup_logging("tracker", log_file=args.log_file, level=args.log_level)
+
+    detector = None
+    if args.detect_interval > 0:
+        detector = face_detector.load_detector(args.detector, args.detector_model)
+        if detector is None:
+            print("    禁用检测门控")
+
     tracker = YOLOFaceTracker(
         camera_id=args.camera,
         width=args.width,
         height=args.height,
         target_ip=args.ip,
-        target_port=args.port
+        target_port=args.port,
+        fps=args.fps,
+        rescan_cameras=args.rescan_cameras,
+        detector=detector,
+        detect_interval=args.detect_interval,
+        roi_padding=args.roi_padding
     )
 
     tracker.run(visualize=not args.no_visualize)